@@ -1,55 +1,127 @@
 import io
-from collections.abc import Iterator
-from contextlib import contextmanager
+import os
+from collections.abc import Iterator, Mapping
 from struct import Struct
 from typing import (
     IO,
     TYPE_CHECKING,
     Any,
+    ClassVar,
     NamedTuple,
-    cast,
+    Optional,
 )
 
-from pakal.archive import BaseArchive, make_opener, read_file
+import numpy as np
+from numpy.lib.recfunctions import structured_to_unstructured
+
+from pakal.archive import (
+    BaseArchive,
+    ReadView,
+    make_opener,
+    normalize_name,
+    read_file,
+)
 
 if TYPE_CHECKING:
     from pakal.archive import ArchiveIndex
 
-UINT32LE = Struct('<I')
-UINT32LE_X4 = Struct('<4I')
-FLOAT32LE = Struct('<f')
+# tag, version, 4 section offsets, 4 section sizes
+HEADER = Struct('<4sf4I4I')
 
 VERSION_1_0 = 1.0
 VERSION_1_5 = 1.5
 
-FILE_ENTRY_1_0 = Struct('<5I')
-FILE_ENTRY_1_5 = Struct('<Q4I')
+INDEX_ENTRY = np.dtype('<u4')
+
+FILE_ENTRY_1_0 = np.dtype(
+    [
+        ('data_offset', '<u4'),
+        ('name_offset', '<u4'),
+        ('compressed_size', '<u4'),
+        ('decompressed_size', '<u4'),
+        ('is_compressed', '<u4'),
+    ],
+)
+FILE_ENTRY_1_5 = np.dtype(
+    [
+        ('data_offset', '<u8'),
+        ('name_offset', '<u4'),
+        ('compressed_size', '<u4'),
+        ('decompressed_size', '<u4'),
+        ('is_compressed', '<u4'),
+    ],
+)
 
 
 class LPAKFileEntry(NamedTuple):
-    data_offset: int
+    data_offset: int  # absolute, already rebased on the start of the data section
     name_offset: int
     compressed_size: int
     decompressed_size: int
     is_compressed: int
 
 
-def read_uint32le_x4(stream: IO[bytes]) -> tuple[int, int, int, int]:
-    return cast(
-        tuple[int, int, int, int],
-        UINT32LE_X4.unpack(stream.read(UINT32LE_X4.size)),
-    )
+class LPAKIndex(Mapping[str, LPAKFileEntry]):
+    """
+    LPAK entries keyed by their raw, still encoded names.
+
+    Lookups encode the requested name rather than decoding every stored one.
+    The decoded and normalized names are only built when the index is iterated
+    or a lookup misses.
+    """
+
+    __slots__ = ('_decoded', '_entries')
+
+    names_normalized: ClassVar[bool] = True
 
+    def __init__(self, entries: dict[bytes, LPAKFileEntry]) -> None:
+        self._entries = entries
+        self._decoded: Optional[dict[str, LPAKFileEntry]] = None
 
-def read_float(stream: IO[bytes]) -> float:
-    return cast(float, FLOAT32LE.unpack(stream.read(FLOAT32LE.size))[0])
+    def _names(self) -> dict[str, LPAKFileEntry]:
+        if self._decoded is None:
+            self._decoded = {
+                normalize_name(name.decode()): entry
+                for name, entry in self._entries.items()
+            }
+        return self._decoded
 
+    def __getitem__(self, name: str) -> LPAKFileEntry:
+        try:
+            return self._entries[name.encode()]
+        except (KeyError, UnicodeEncodeError):
+            return self._names()[name]
 
-def read_iter(structure: Struct, stream: IO[bytes], size: int | None) -> Iterator[tuple[Any, ...]]:
-    return structure.iter_unpack(stream.read(size))  # type: ignore[arg-type]
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._names())
+
+    def __len__(self) -> int:
+        return len(self._names())
+
+
+def read_table(dtype: np.dtype[Any], stream: IO[bytes], size: int | None) -> np.ndarray:
+    return np.frombuffer(stream.read(size), dtype=dtype)  # type: ignore[arg-type]
+
+
+def read_file_entries(
+    dtype: np.dtype[Any],
+    stream: IO[bytes],
+    size: int | None,
+    data_offset: int,
+) -> list[LPAKFileEntry]:
+    table = structured_to_unstructured(
+        read_table(dtype, stream, size),
+        dtype=np.uint64,
+    )
+    table[:, 0] += np.uint64(data_offset)
+    return list(map(LPAKFileEntry._make, table.tolist()))
 
 
 def get_stream_size(stream: IO[bytes]) -> int:
+    try:
+        return os.fstat(stream.fileno()).st_size
+    except (AttributeError, OSError):
+        pass
     pos = stream.tell()
     stream.seek(0, io.SEEK_END)
     size = stream.tell()
@@ -61,77 +133,72 @@ def read_header(
     stream: IO[bytes],
 ) -> tuple[bytes, float, list[tuple[int, int]]]:
     size = get_stream_size(stream)
-    tag = stream.read(4)
+    tag, version, *fields = HEADER.unpack(stream.read(HEADER.size))
     assert tag == b'LPAK'[::-1]
-    version = read_float(stream)
+    offs, sizes = fields[:4], fields[4:]
     if version >= VERSION_1_5:
         assert version == VERSION_1_5, version
-        offs = list(read_uint32le_x4(stream))
-        sizes = list(read_uint32le_x4(stream))
         resizes = sizes[1], sizes[0], sizes[2], size - offs[0]
         cues = list(zip(offs, resizes))
         return tag, version, cues
     assert version == VERSION_1_0, version
-    cues = list(
-        zip(
-            *[
-                read_uint32le_x4(stream),
-                read_uint32le_x4(stream),
-            ],
-        ),  # type: ignore[arg-type]
-    )
+    cues = list(zip(offs, sizes))
     return tag, version, cues
 
 
 def get_findex(
     stream: IO[bytes],
     cues: list[tuple[int, int]],
-) -> tuple[dict[str, LPAKFileEntry], int]:
+) -> tuple[LPAKIndex, int]:
     index, ftable, names, data = cues
     assert stream.tell() == index[0]
-    _ = [val[0] for val in read_iter(UINT32LE, stream, index[1])]
+    _ = read_table(INDEX_ENTRY, stream, index[1])
     assert stream.tell() == ftable[0]
-    rftable = [LPAKFileEntry(*val) for val in read_iter(FILE_ENTRY_1_0, stream, ftable[1])]
+    rftable = read_file_entries(FILE_ENTRY_1_0, stream, ftable[1], data[0])
     assert stream.tell() == names[0]
-    rnames = [name.decode() for name in stream.read(names[1]).split(b'\0')]
+    rnames = stream.read(names[1]).split(b'\0')
     assert stream.tell() == data[0]
-    findex = dict(zip(rnames, rftable))
+    findex = LPAKIndex(dict(zip(rnames, rftable)))
     return findex, data[0]
 
 
 def get_findex_v15(
     stream: IO[bytes],
     cues: list[tuple[int, int]],
-) -> tuple[dict[str, LPAKFileEntry], int]:
+) -> tuple[LPAKIndex, int]:
     ftable, index, names, data = cues
     _ = stream.read(8)
     assert stream.tell() == ftable[0], (stream.tell(), ftable[0])
-    rftable = [LPAKFileEntry(*val) for val in read_iter(FILE_ENTRY_1_5, stream, ftable[1])]
+    rftable = read_file_entries(FILE_ENTRY_1_5, stream, ftable[1], data[0])
     assert stream.tell() == index[0], (stream.tell(), index[0])
-    _ = [val[0] for val in read_iter(UINT32LE, stream, index[1])]
+    _ = read_table(INDEX_ENTRY, stream, index[1])
     assert stream.tell() == names[0]
-    rnames = [name.decode() for name in stream.read(names[1]).split(b'\0')]
+    rnames = stream.read(names[1]).split(b'\0')
     assert stream.tell() == data[0]
-    findex = dict(zip(rnames, rftable))
+    findex = LPAKIndex(dict(zip(rnames, rftable)))
     return findex, data[0]
 
 
 class LPakArchive(BaseArchive[LPAKFileEntry]):
     def _create_index(self) -> 'ArchiveIndex[LPAKFileEntry]':
-        tag, version, cues = read_header(self._stream)
-        self.version = version
-        read_findex = get_findex if version < VERSION_1_5 else get_findex_v15
-        index, data = read_findex(self._stream, cues)
+        with self._index_stream() as stream:
+            tag, version, cues = read_header(stream)
+            self.version = version
+            read_findex = get_findex if version < VERSION_1_5 else get_findex_v15
+            index, data = read_findex(stream, cues)
         self.data_off = data
         return index
 
-    @contextmanager
-    def _read_entry(self, entry: LPAKFileEntry) -> Iterator[IO[bytes]]:
-        yield read_file(
-            self._stream,
-            self.data_off + entry.data_offset,
-            entry.compressed_size,
+    def _read_entry(self, entry: LPAKFileEntry) -> ReadView:
+        return ReadView(
+            read_file(self._source, entry.data_offset, entry.compressed_size),
         )
 
+    def _entry_range(self, entry: LPAKFileEntry) -> Optional[tuple[int, int]]:
+        if type(self)._read_entry is not LPakArchive._read_entry:  # noqa: SLF001
+            # entries are transformed on read, the stored bytes will not do
+            return None
+        return entry.data_offset, entry.compressed_size
+
 
 open = make_opener(LPakArchive)
@@ -3,7 +3,7 @@ from functools import partial
 from itertools import takewhile
 from typing import IO, TYPE_CHECKING, Any
 
-from pakal.archive import SimpleArchive, make_opener
+from pakal.archive import SimpleArchive, SimpleIndex, make_opener
 from pakal.examples.common import read_uint32_le, readcstr
 
 if TYPE_CHECKING:
@@ -31,12 +31,13 @@ def create_index_mapping(
     offsets: Sequence[int],
 ) -> 'ArchiveIndex[SimpleEntry]':
     sizes = [(end - start) for start, end in zip(offsets, offsets[1:])]
-    return dict(zip(names, zip(offsets, sizes)))
+    return SimpleIndex(zip(names, zip(offsets, sizes)))
 
 
 class PakFile(SimpleArchive):
     def _create_index(self) -> 'ArchiveIndex[SimpleEntry]':
-        return create_index_mapping(*read_index_entries(self._stream))
+        with self._index_stream() as stream:
+            return create_index_mapping(*read_index_entries(stream))
 
 
 open = make_opener(PakFile)
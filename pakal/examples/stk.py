@@ -1,9 +1,8 @@
 import io
 from collections.abc import Iterator
-from contextlib import contextmanager
 from typing import IO, TYPE_CHECKING, AnyStr, NamedTuple, cast
 
-from pakal.archive import BaseArchive, make_opener
+from pakal.archive import BaseArchive, ReadView, make_opener
 from pakal.examples.common import read_uint16_le, read_uint32_le
 from pakal.stream import PartialStreamView
 
@@ -83,16 +82,18 @@ def unpack(stream: IO[bytes], offset: int, size: int, compression: int) -> IO[by
     if not compression:
         return view
     uncompressed_size = read_uint32_le(view)
-    return io.BytesIO(unpack_chunk(stream, uncompressed_size))
+    return io.BytesIO(unpack_chunk(io.BytesIO(view.read()), uncompressed_size))
 
 
 class STKArchive(BaseArchive[STKFileEntry]):
     def _create_index(self) -> 'ArchiveIndex[STKFileEntry]':
-        return dict(extract(self._stream))
+        with self._index_stream() as stream:
+            return dict(extract(stream))
 
-    @contextmanager
-    def _read_entry(self, entry: STKFileEntry) -> Iterator[IO[bytes]]:
-        yield unpack(self._stream, entry.offset, entry.size, entry.compression)
+    def _read_entry(self, entry: STKFileEntry) -> ReadView:
+        return ReadView(
+            unpack(self._stream, entry.offset, entry.size, entry.compression),
+        )
 
 
 open = make_opener(STKArchive)
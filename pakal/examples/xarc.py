@@ -1,34 +1,43 @@
 import pathlib
 from collections.abc import Iterator
+from struct import Struct
 from typing import IO, TYPE_CHECKING
 
 from pakal.archive import (
     GLOB_ALL,
     SimpleArchive,
+    SimpleIndex,
     make_opener,
 )
-from pakal.examples.common import read_uint32_le, readcstr
+from pakal.examples.common import read_uint32_le
 
 if TYPE_CHECKING:
     from pakal.archive import ArchiveIndex, SimpleEntry
 
+UINT32LE_X2 = Struct('<2I')
+
 
 def read_index_entries(stream: IO[bytes]) -> Iterator[tuple[str, 'SimpleEntry']]:
     _unknown = read_uint32_le(stream)
     file_count = read_uint32_le(stream)
     base_offset = read_uint32_le(stream)
+    # entries are stored between the header and the data of the first file
+    entries = stream.read(base_offset - stream.tell())
+    pos = 0
     offset = base_offset
     for _i in range(file_count):
-        file_name = readcstr(stream).decode('ascii')
-        file_size = read_uint32_le(stream)
-        _unknown2 = read_uint32_le(stream)
+        end = entries.index(b'\0', pos)
+        file_name = entries[pos:end].decode('ascii')
+        file_size, _unknown2 = UINT32LE_X2.unpack_from(entries, end + 1)
+        pos = end + 1 + UINT32LE_X2.size
         yield file_name, (offset, file_size)
         offset += file_size
 
 
 class TLJXArchive(SimpleArchive):
     def _create_index(self) -> 'ArchiveIndex[SimpleEntry]':
-        return dict(read_index_entries(self._stream))
+        with self._index_stream() as stream:
+            return SimpleIndex(read_index_entries(stream))
 
 
 open = make_opener(TLJXArchive)
@@ -1,30 +1,204 @@
+import functools
 import io
+import mmap
 import os
+import shutil
 import tempfile
-from collections.abc import Iterator
-from contextlib import AbstractContextManager
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
 from types import TracebackType
-from typing import IO, AnyStr, Optional, Union, overload
+from typing import IO, TYPE_CHECKING, Any, AnyStr, Optional, Union, overload
 
 import numpy as np
-from numpy.typing import ArrayLike
+from numpy.typing import ArrayLike, NDArray
 
+if TYPE_CHECKING:
+    from typing_extensions import Self
 
-class ResourceStream(io.RawIOBase):
-    __slots__ = ('_pos', '_size', '_res')
+# inputs at least this large are split between threads, in aligned chunks
+_PARALLEL_XOR_SIZE = 64 << 20
+_XOR_CHUNK_ALIGN = 64 << 10
+# files smaller than this are read into memory instead of mapped
+_SMALL_FILE_SIZE = 64 << 20
+# memory backed scratch files count against RAM, larger copies go to disk
+_MEMFD_MAX_SIZE = 512 << 20
+# stands in for the data of closed resources
+_EMPTY_BUFFER = memoryview(b'')
+# below this size a translation table beats the ufunc call overhead
+_SMALL_XOR_SIZE = 8 << 10
 
-    def __init__(self, res: 'ResourceFile') -> None:
-        self._pos = 0
-        self._size = len(res.buffer)
-        self._res = res
+
+@functools.cache
+def _xor_table(key: int) -> bytes:
+    return bytes(i ^ key for i in range(256))
+
+
+def _xor_into(src: NDArray[np.uint8], key: int, out: NDArray[np.uint8]) -> None:
+    """
+    XOR `src` with the single byte `key` into `out`.
+
+    Large inputs are processed in parallel; NumPy releases the GIL while
+    running the ufunc, so each thread gets a core.
+    """
+    size = len(src)
+    workers = os.cpu_count() or 1
+    if size < _PARALLEL_XOR_SIZE or workers == 1:
+        _xor_block(src, key, out)
+        return
+    chunk = -(-size // workers)
+    chunk += -chunk % _XOR_CHUNK_ALIGN
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                _xor_block,
+                src[start : start + chunk],
+                key,
+                out[start : start + chunk],
+            )
+            for start in range(0, size, chunk)
+        ]
+    for future in futures:
+        future.result()
+
+
+def _xor_block(src: NDArray[np.uint8], key: int, out: NDArray[np.uint8]) -> None:
+    """
+    XOR `src` with the single byte `key` into `out`.
+
+    The bulk is processed as 64-bit words against the key repeated over a word,
+    leaving only the bytes before the first word boundary of `src` and the tail
+    which does not fill a word for the bytewise pass.
+    """
+    # NumPy only takes its vectorized loops for aligned words
+    head = min(len(src), -src.ctypes.data % 8)
+    np.bitwise_xor(src[:head], np.uint8(key), out=out[:head])
+    src, out = src[head:], out[head:]
+    full = len(src) - len(src) % 8
+    np.bitwise_xor(
+        src[:full].view(np.uint64),
+        np.uint64(key * 0x0101010101010101),
+        out=out[:full].view(np.uint64),
+    )
+    np.bitwise_xor(src[full:], np.uint8(key), out=out[full:])
+
+
+def copy_range(src_fd: int, dst: IO[bytes], offset: int, size: int) -> int:
+    """
+    Copy `size` bytes at `offset` of `src_fd` to the position of `dst`, in-kernel.
+
+    Returns the number of bytes copied, which falls short when `os.sendfile` is
+    unavailable or fails, leaving the rest for the caller to copy. Does not
+    touch the position of `src_fd`, so it is safe to call concurrently.
+    """
+    copied = 0
+    if hasattr(os, 'sendfile'):
+        out_fd = dst.fileno()
+        try:
+            while copied < size:
+                sent = os.sendfile(out_fd, src_fd, offset + copied, size - copied)
+                if not sent:
+                    break
+                copied += sent
+        except OSError:
+            # e.g. platforms which only support sending to sockets
+            pass
+    return copied
+
+
+def _copy_file(src: IO[bytes], dst: IO[bytes], size: int) -> None:
+    """Copy `size` bytes from the start of `src` into `dst`, in-kernel if possible."""
+    offset = copy_range(src.fileno(), dst, 0, size)
+    if offset < size:
+        src.seek(offset)
+        dst.seek(offset)
+        shutil.copyfileobj(src, dst)
+    dst.flush()
+
+
+def _scratch_file(size: int) -> IO[bytes]:
+    """Create an anonymous temporary file for `size` bytes, in memory if small."""
+    if size <= _MEMFD_MAX_SIZE and hasattr(os, 'memfd_create'):
+        with suppress(OSError):
+            return os.fdopen(os.memfd_create('pakal'), 'r+b')
+    return tempfile.TemporaryFile()
+
+
+def _madvise(data: np.memmap, advice: str) -> None:
+    """
+    Advise the kernel on how the mapping behind `data` will be accessed.
+
+    Takes the name of an `mmap.MADV_*` constant. Does nothing for the default
+    `MADV_NORMAL` and on platforms lacking `madvise` or the given advice.
+    """
+    if advice == 'MADV_NORMAL':
+        return
+    with suppress(AttributeError, OSError):
+        mapping = data._mmap  # type: ignore[attr-defined]  # noqa: SLF001
+        mapping.madvise(getattr(mmap, advice))
+
+
+def _decode(data: memoryview, key: int) -> memoryview:
+    """Return `data` XORed with `key`, or `data` itself when there is no key."""
+    if not key:
+        return data
+    if len(data) < _SMALL_XOR_SIZE:
+        return memoryview(bytes(data).translate(_xor_table(key)))
+    out = np.empty(len(data), dtype='u1')
+    _xor_into(np.frombuffer(data, dtype='u1'), key, out)
+    return out.data
+
+
+def _decode_bytes(data: Union[bytes, memoryview], key: int) -> bytes:
+    """Return `data` XORed with `key` as bytes, without copying unkeyed bytes."""
+    if not key:
+        return bytes(data)
+    if len(data) < _SMALL_XOR_SIZE:
+        return bytes(data).translate(_xor_table(key))
+    return _decode(memoryview(data), key).tobytes()
+
+
+class ResourceReader:
+    """
+    Seekable binary reader over (possibly encoded) resource data.
+
+    Implements just the reading subset of the file API, without the `io` class
+    machinery, plus `read_at` and `partial` for random access that leaves the
+    position as is. Subclasses provide `closed`, `close` and `_fetch`.
+    """
+
+    __slots__ = ('_key', '_pos', '_size')
+
+    _key: int
+    _pos: int
+    _size: int
+
+    def __enter__(self) -> 'Self':
+        return self
+
+    def __exit__(
+        self,
+        __exc_type: type[BaseException] | None,
+        __exc_value: BaseException | None,
+        __traceback: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    @property
+    def closed(self) -> bool:
+        raise NotImplementedError
+
+    @property
+    def size(self) -> int:
+        return self._size
 
     def seek(self, offset: int, whence: int = 0) -> int:
-        if whence == io.SEEK_CUR:
-            offset += self._pos
-        elif whence == io.SEEK_END:
-            offset += self._size
+        if whence:
+            if whence == io.SEEK_CUR:
+                offset += self._pos
+            elif whence == io.SEEK_END:
+                offset += self._size
         self._pos = offset
-        return self._pos
+        return offset
 
     def tell(self) -> int:
         return self._pos
@@ -35,46 +209,251 @@ class ResourceStream(io.RawIOBase):
     def seekable(self) -> bool:
         return True
 
+    def writable(self) -> bool:
+        return False
+
     def read(self, size: int | None = None) -> bytes:
-        if size is not None and size >= 0:
-            size = min(self._size - self._pos, size)
+        return _decode_bytes(self._take(size), self._key)
+
+    def read_view(self, size: int | None = None) -> memoryview:
+        """
+        Read like `read`, but return a view of the data rather than a copy.
+
+        For mapped data, the view is only valid while the reader is open.
+        Keyed resources still need a decoded copy.
+        """
+        return _decode(self._take(size), self._key)
+
+    def _take(self, size: int | None) -> memoryview:
+        """Return up to `size` bytes as stored from the position, advancing it."""
+        self._check_open()
+        pos = self._pos
+        end = self._size
+        if size is not None and 0 <= size < end - pos:
+            end = pos + size
+        if end <= pos:
+            return _EMPTY_BUFFER
+        data = self._fetch(pos, end)
+        self._pos = pos + len(data)
+        return data
+
+    def _fetch(self, start: int, end: int) -> memoryview:
+        """Return the bytes between `start` and `end` as stored, clamped to size."""
+        raise NotImplementedError
+
+    def _check_open(self) -> None:
+        if self.closed:
+            raise OSError('I/O operation on closed file')  # noqa: TRY003
+
+    def read_at(self, offset: int, size: int) -> memoryview:
+        """Read like `read_view` from the given offset, leaving the position as is."""
+        self._check_open()
+        return _decode(self._fetch(offset, offset + size), self._key)
+
+    def readinto(self, b: bytearray) -> int:
+        data = self.read_view(len(b))
+        with memoryview(b) as view:
+            view[: len(data)] = data
+        return len(data)
+
+    def close(self) -> None:
+        raise NotImplementedError
+
+    def partial(self, offset: int, size: int) -> IO[bytes]:
+        """Open a stream over `size` bytes from `offset`, see `open_buffer`."""
+        self._check_open()
+        return open_buffer(self._fetch(offset, offset + size), self._key)
+
+
+class _FastStream(ResourceReader):
+    """
+    Reader over a `ResourceFile`, for use by pakal's own parsers.
+
+    Reads slice the underlying buffer, so views share the mapped data.
+    """
+
+    __slots__ = ('_arr', '_buf', '_res')
+
+    def __init__(self, res: 'ResourceFile') -> None:
+        self._pos = 0
+        self._size = len(res)
+        self._res = res
+        # bound once, reads index these directly
+        self._buf = res._raw  # noqa: SLF001
+        self._arr = res._array  # noqa: SLF001
+        self._key = res.key
+
+    @property
+    def closed(self) -> bool:
+        return self._res.closed
+
+    def _fetch(self, start: int, end: int) -> memoryview:
+        return self._buf[start:end]
+
+    def readinto(self, b: bytearray) -> int:
+        self._check_open()
+        pos = self._pos
+        size = min(len(b), self._size - pos)
+        if size <= 0:
+            return 0
+        end = pos + size
+        key = self._key
+        if key and size >= _SMALL_XOR_SIZE:
+            out = np.frombuffer(b, dtype='u1')[:size]
+            _xor_into(self._arr[pos:end], key, out)
         else:
-            size = self._size - self._pos
-        prev = self._pos
-        self._pos += size
-        return self._res.buffer[prev:self._pos].tobytes()
-
-    def readinto(self, b: bytearray) -> int: # type: ignore[override]
-        size = min(len(b), self._size - self._pos)
-        b[:size] = self._res.buffer[self._pos:self._pos + size]
-        self._pos += size
+            with memoryview(b) as view:
+                view[:size] = _decode(self._buf[pos:end], key)
+        self._pos = end
         return size
 
     def close(self) -> None:
-        super().close()
         self._res.close()
 
+
+class _PreadStream(ResourceReader):
+    """
+    Reader over a (possibly encoded) file, using `os.pread`.
+
+    Reads fetch exactly the requested bytes instead of faulting in whole pages
+    of a mapping, which suits sparse random access into huge files.
+    """
+
+    __slots__ = ('_fd', '_file')
+
+    def __init__(self, file: io.FileIO, key: int = 0x00) -> None:
+        # the file object closes the descriptor should the reader be dropped
+        self._file = file
+        self._fd = file.fileno()
+        self._key = key
+        self._pos = 0
+        self._size = os.fstat(self._fd).st_size
+
+    @property
+    def closed(self) -> bool:
+        return self._file.closed
+
+    def _fetch(self, start: int, end: int) -> memoryview:
+        size = max(0, min(end, self._size) - start)
+        return memoryview(os.pread(self._fd, size, start))
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class ResourceStream(io.RawIOBase):
+    """Adapts `_FastStream` to `io.RawIOBase`, for the buffered and text wrappers."""
+
+    __slots__ = ('_stream',)
+
+    def __init__(self, res: 'ResourceFile') -> None:
+        self._stream = _FastStream(res)
+
+    @property
+    def size(self) -> int:
+        return self._stream.size
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        return self._stream.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._stream.tell()
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def read(self, size: int | None = None) -> bytes:
+        return self._stream.read(size)
+
+    def read_view(self, size: int | None = None) -> memoryview:
+        return self._stream.read_view(size)
+
+    def read_at(self, offset: int, size: int) -> memoryview:
+        return self._stream.read_at(offset, size)
+
+    def readinto(self, b: bytearray) -> int:  # type: ignore[override]
+        # `io.BufferedReader` fills its buffer and serves large reads through
+        # here, so the data is copied (or decoded) straight into `b`
+        return self._stream.readinto(b)
+
+    def close(self) -> None:
+        super().close()
+        self._stream.close()
+
     def partial(self, offset: int, size: int) -> IO[bytes]:
-        if size > io.DEFAULT_BUFFER_SIZE:
-            res = ResourceFile(self._res[offset:offset + size])
-            return io.BufferedReader(ResourceStream(res))
-        return io.BytesIO(self._res[offset:offset + size]) # type: ignore[arg-type]
+        return self._stream.partial(offset, size)
+
+
+# streams with `size`, `read_at` and `partial`, for random access by offset
+RESOURCE_READERS = (ResourceReader, ResourceStream)
+
 
+class ResourceFile:
+    """
+    Read-only random access to the contents of a (possibly encoded) file.
 
-class ResourceFile(AbstractContextManager[memoryview]):
-    __slots__ = ('buffer', 'closed')
+    The data is kept as stored; a non-zero `key` is XORed into the requested
+    bytes only when they are read, so work is proportional to the amount of data
+    actually accessed. Only `buffer` decodes the whole file, once.
+    """
 
-    def __init__(self, buffer: ArrayLike, tmpfile: Optional[tempfile.TemporaryFile] = None) -> None:
-        self.buffer = memoryview(buffer)  # type: ignore[arg-type]
+    __slots__ = ('_array', '_decoded', '_raw', '_tmpfile', 'closed', 'key')
+
+    def __init__(
+        self,
+        buffer: ArrayLike,
+        tmpfile: Optional[tempfile.TemporaryFile] = None,
+        key: int = 0x00,
+    ) -> None:
+        # views of the data are handed out as is, make sure they cannot be
+        # used to write through to the file
+        self._raw = memoryview(buffer).toreadonly()  # type: ignore[arg-type]
+        self._array = np.frombuffer(self._raw, dtype='u1')
+        self._decoded: Optional[memoryview] = None
         self.closed = False
         self._tmpfile = tmpfile
+        self.key = key
+
+    @property
+    def buffer(self) -> memoryview:
+        """
+        The decoded data, as a read-only view.
+
+        Keyed data is decoded in whole on first access; large files into a
+        temporary file on disk, rather than memory.
+        """
+        if not self.key:
+            return self._raw
+        if self._decoded is None:
+            self._decoded = self._decode_all()
+        return self._decoded
+
+    def _decode_all(self) -> memoryview:
+        size = len(self._raw)
+        if size < _SMALL_FILE_SIZE:
+            return _decode(self._raw, self.key).toreadonly()
+        # the mapping holds on to the file, it is deleted once unmapped
+        with tempfile.TemporaryFile() as tmp:
+            tmp.truncate(size)
+            out = np.memmap(tmp, dtype='u1', mode='r+', shape=(size,))
+        _xor_into(self._array, self.key, out)
+        return out.data.toreadonly()
 
     def __len__(self) -> int:
-        return len(self.buffer)
+        return len(self._raw)
 
     def __buffer__(self, _flags: int) -> memoryview:
         return self.buffer
 
+    def __bytes__(self) -> bytes:
+        return _decode_bytes(self._raw, self.key)
+
+    def __enter__(self) -> 'Self':
+        return self
+
     def __exit__(
         self,
         __exc_type: type[BaseException] | None,
@@ -85,30 +464,67 @@ class ResourceFile(AbstractContextManager[memoryview]):
         return None
 
     @overload
-    def __getitem__(self, index: slice) -> ArrayLike: ...
+    def __getitem__(self, index: slice) -> memoryview: ...
     @overload
     def __getitem__(self, index: int) -> int: ...
-    def __getitem__(self, index: slice | int) -> ArrayLike | int:
-        if not self.closed:
-            return self.buffer[index]
-        raise OSError('I/O operation on closed file')  # noqa: TRY003
+    def __getitem__(self, index: slice | int) -> memoryview | int:
+        if self.closed:
+            raise OSError('I/O operation on closed file')  # noqa: TRY003
+        if isinstance(index, slice):
+            return _decode(self._raw[index], self.key)
+        return self._raw[index] ^ self.key
+
+    def as_array(self) -> NDArray[np.uint8]:
+        """Return the decoded data as a read-only NumPy array, sharing `buffer`."""
+        if not self.key:
+            return self._array
+        return np.frombuffer(self.buffer, dtype='u1')
 
     @classmethod
     def load(
         cls,
         file_path: Union[str, bytes, os.PathLike[AnyStr]],
         key: int = 0x00,
+        access_hint: str = 'MADV_NORMAL',
+        *,
+        copy: bool = True,
     ) -> 'ResourceFile':
-        data = np.memmap(file_path, dtype='u1', mode='r')
+        """
+        Load the file at `file_path`, to be decoded with `key`.
+
+        Large files are memory-mapped, `access_hint` names the `mmap.MADV_*`
+        advice to give for the mapping, e.g. `MADV_RANDOM` for scattered reads.
+        Large files without a key are mapped from a private copy, unless `copy`
+        is false, in which case the result is a read-only view of the file on
+        disk and reflects changes made to it.
+        """
+        with io.open(file_path, 'rb') as src:
+            size = os.fstat(src.fileno()).st_size
+            if size < _SMALL_FILE_SIZE:
+                # cheaper to read in whole, decoding in place
+                data = np.fromfile(src, dtype='u1')
+                if key:
+                    _xor_into(data, key, data)
+                return cls(data)
 
-        tmp = tempfile.TemporaryFile()
-        result = np.memmap(tmp, dtype='u1', mode='w+', shape=data.shape)
-        result[:] = data ^ key
-        result.flush()
-        del result
-        return cls(np.memmap(tmp, dtype='u1', mode='r', shape=data.shape), tmp)
+            if key or not copy:
+                # mapped in place, a key is applied on read
+                data = np.memmap(src, dtype='u1', mode='r')
+                _madvise(data, access_hint)
+                return cls(data, key=key)
+
+            # nothing to decode, have the kernel copy the file as is
+            tmp = _scratch_file(size)
+            _copy_file(src, tmp, size)
+        data = np.memmap(tmp, dtype='u1', mode='r', shape=(size,))
+        _madvise(data, access_hint)
+        return cls(data, tmp)
 
     def close(self) -> None:
+        # drop the data, so the mapping goes away with the last view of it
+        self._raw = _EMPTY_BUFFER
+        self._decoded = None
+        self._array = np.frombuffer(_EMPTY_BUFFER, dtype='u1')
         if self._tmpfile is not None:
             self._tmpfile.close()
             self._tmpfile = None
@@ -121,9 +537,10 @@ class ResourceFile(AbstractContextManager[memoryview]):
         mode: str = 'r',
         encoding: str = 'utf-8',
         errors: Optional[str] = None,
-    ) -> Iterator[IO[AnyStr]]:
+    ) -> IO[Any]:
         ostream: IO  # type: ignore[type-arg]
-        res = cls.load(file)
+        # streams only ever read, no need for a private copy
+        res = cls.load(file, copy=False)
         ostream = io.BufferedReader(ResourceStream(res))
         if 'b' not in mode:
             ostream = io.TextIOWrapper(
@@ -133,7 +550,54 @@ class ResourceFile(AbstractContextManager[memoryview]):
             )
         return ostream
 
+    @classmethod
+    def open_pread(
+        cls,
+        file: Union[str, bytes, os.PathLike[AnyStr]],
+        key: int = 0x00,
+    ) -> ResourceReader:
+        """
+        Open a file for reading in binary mode, without mapping it.
+
+        Reads go through `os.pread`, fetching only the requested bytes; prefer
+        this for sparse random access into huge files. Falls back to reading
+        through `load` where `os.pread` is unavailable.
+        """
+        if not hasattr(os, 'pread'):
+            return _FastStream(
+                cls.load(file, key=key, access_hint='MADV_RANDOM', copy=False),
+            )
+        return _PreadStream(io.FileIO(file), key=key)
+
+
+def open_buffer(data: memoryview, key: int = 0x00) -> IO[bytes]:
+    """
+    Open a binary stream over `data`, decoded with `key`.
+
+    Large buffers are read in place rather than copied; small ones are decoded
+    up front, where a copy costs less than the stream machinery.
+    """
+    if len(data) > io.DEFAULT_BUFFER_SIZE:
+        return io.BufferedReader(ResourceStream(ResourceFile(data, key=key)))
+    # `io.BytesIO` shares bytes it is created with rather than copying them
+    return io.BytesIO(_decode_bytes(data, key))
+
+
+def open_reader(data: memoryview, key: int = 0x00) -> ResourceReader:
+    """
+    Open a lightweight reader over `data`, decoded with `key`.
+
+    Unlike `open_buffer`, the result is not an `io` stream: it only implements
+    the reading subset of the file API, see `ResourceReader`.
+    """
+    return _FastStream(ResourceFile(data, key=key))
+
 
 def read_file(file_path: str, key: int = 0x00) -> bytes:
-    with ResourceFile.load(file_path, key=key) as res:
+    with ResourceFile.load(
+        file_path,
+        key=key,
+        access_hint='MADV_SEQUENTIAL',
+        copy=False,
+    ) as res:
         return bytes(res)
@@ -1,14 +1,28 @@
 import io
-from typing import IO, Optional
+from typing import IO, Optional, cast
+
+from pakal.fileio import RESOURCE_READERS
 
 
 class PartialStreamView(io.RawIOBase):
+    _size: int
+
     def __init__(self, stream: IO[bytes], size: int) -> None:
         self._stream: IO[bytes] = stream
         self._start = stream.tell()
-        if isinstance(self._stream, PartialStreamView):
+        while isinstance(self._stream, PartialStreamView):
+            # never reach past the end of the enclosing view
+            size = max(0, min(size, self._stream._size - self._start))  # noqa: SLF001
             self._start += self._stream._start  # noqa: SLF001
             self._stream = self._stream._stream  # noqa: SLF001
+        raw = self._stream
+        if isinstance(raw, io.BufferedReader):
+            raw = cast(IO[bytes], raw.raw)
+        # resources are read at absolute offsets, without moving the shared cursor
+        self._resource = raw if isinstance(raw, RESOURCE_READERS) else None
+        if self._resource is not None:
+            # never reach past the end of the resource
+            size = max(0, min(size, self._resource.size - self._start))
         self._size = size
         self._pos = 0
 
@@ -24,11 +38,28 @@ class PartialStreamView(io.RawIOBase):
         return self._pos
 
     def read(self, size: Optional[int] = None) -> bytes:
-        self._stream.seek(self._start + self._pos, io.SEEK_SET)
         if size is not None and size >= 0:
             size = min(self._size - self._pos, size)
         else:
             size = self._size - self._pos
-        res = self._stream.read(size)
+        if self._resource is not None:
+            res = self._resource.read_at(self._start + self._pos, size).tobytes()
+        else:
+            self._stream.seek(self._start + self._pos, io.SEEK_SET)
+            res = self._stream.read(size)
         self._pos += len(res)
         return res
+
+    def readinto(self, buffer: bytearray) -> int:  # type: ignore[override]
+        size = max(0, min(len(buffer), self._size - self._pos))
+        res: int
+        with memoryview(buffer) as view:
+            if self._resource is not None:
+                data = self._resource.read_at(self._start + self._pos, size)
+                view[: len(data)] = data
+                res = len(data)
+            else:
+                self._stream.seek(self._start + self._pos, io.SEEK_SET)
+                res = self._stream.readinto(view[:size])  # type: ignore[attr-defined]
+        self._pos += res
+        return res
@@ -0,0 +1,476 @@
+import io
+import os
+import pathlib
+import struct
+import types
+from typing import IO, cast
+
+import numpy as np
+import pytest
+
+from pakal import archive as archive_module
+from pakal import fileio
+from pakal.archive import (
+    ArchivePath,
+    Opener,
+    ReadView,
+    SimpleArchive,
+    SimpleEntry,
+    SimpleIndex,
+    _compile_match,
+)
+from pakal.examples import lpak, xarc
+from pakal.examples.lpak import LPAKFileEntry, LPAKIndex
+from pakal.stream import PartialStreamView
+
+NAMES = [
+    'a.txt',
+    'b.TXT',
+    'x',
+    'dir/a.txt',
+    'dir/sub/b.py',
+    'other/dir/a.txt',
+    'a/b/c.py',
+    '.hidden',
+    'dir/[x].txt',
+]
+
+PATTERNS = [
+    '*',
+    '*.txt',
+    '?.txt',
+    '[ab].*',
+    '[!a]*',
+    'a.txt',
+    'dir/*',
+    'dir/*.txt',
+    '*/*.txt',
+    '*/*/*',
+    'a/*/c.py',
+    'sub/*.py',
+    '/dir/*.txt',
+    '/*',
+    '.*',
+    '*[[]x].txt',
+]
+
+
+@pytest.mark.parametrize('pattern', PATTERNS)
+@pytest.mark.parametrize('name', NAMES)
+def test_compile_match_agrees_with_purepath(name: str, pattern: str) -> None:
+    expected = pathlib.PurePath(name).match(pattern)
+    assert _compile_match(pattern)(str(pathlib.PurePath(name))) == expected
+
+
+def test_compile_match_rejects_empty_pattern() -> None:
+    with pytest.raises(ValueError, match='empty pattern'):
+        _compile_match('')
+
+
+def test_archive_path_fname_is_path() -> None:
+    path = ArchivePath('dir//./a.txt', archive=None)  # type: ignore[arg-type]
+    assert isinstance(path.fname, pathlib.Path)
+    assert str(path) == str(pathlib.Path('dir/a.txt'))
+
+
+def test_simple_index_lookups() -> None:
+    index = SimpleIndex([('a.txt', (0, 10)), ('./dir//b.bin', (10, 5))])
+    assert index['a.txt'] == (0, 10)
+    assert index['dir/b.bin'] == (10, 5)
+    assert index['dir/b.bin'].offset == index.offsets[1]
+    assert list(index) == ['a.txt', 'dir/b.bin']
+    assert len(index) == len(index.offsets)
+    assert 'dir/b.bin' in index
+    assert './dir//b.bin' not in index
+    with pytest.raises(KeyError):
+        index['missing']
+    assert dict(index.items()) == {'a.txt': (0, 10), 'dir/b.bin': (10, 5)}
+
+
+def _lpak_entry(offset: int) -> LPAKFileEntry:
+    return LPAKFileEntry(offset, 0, 1, 1, 0)
+
+
+def test_lpak_index_lookups() -> None:
+    entries = {
+        b'a.txt': _lpak_entry(0),
+        b'dir//b.bin': _lpak_entry(1),
+        'é.txt'.encode(): _lpak_entry(2),
+    }
+    index = LPAKIndex(entries)
+    assert index['a.txt'] == entries[b'a.txt']
+    assert index['é.txt'] == _lpak_entry(2)
+    # names are normalized once the raw lookup misses
+    assert index['dir/b.bin'] == _lpak_entry(1)
+    assert list(index) == ['a.txt', 'dir/b.bin', 'é.txt']
+    assert len(index) == len(entries)
+    assert 'dir/b.bin' in index
+    with pytest.raises(KeyError):
+        index['missing']
+
+
+class _MappingArchive(SimpleArchive):
+    def _create_index(self) -> types.MappingProxyType[str, tuple[int, int]]:
+        return types.MappingProxyType({'./a.txt': (0, 2), 'dir//b.txt': (2, 3)})
+
+
+def test_custom_mapping_index_is_normalized() -> None:
+    with _MappingArchive(io.BytesIO(b'abcde')) as archive:
+        assert set(archive.index) == {'a.txt', str(pathlib.Path('dir/b.txt'))}
+        with archive.open_bytes('dir/b.txt') as member:
+            assert member.read() == b'cde'
+
+
+class _LinesArchive(SimpleArchive):
+    """Lines of `name size` up to an empty one, followed by the member data."""
+
+    def _create_index(self) -> SimpleIndex:
+        sizes: list[tuple[str, int]] = []
+        offset = 0
+        for line in self._stream:
+            offset += len(line)
+            if line == b'\n':
+                break
+            raw_name, raw_size = line.split()
+            sizes.append((raw_name.decode(), int(raw_size)))
+        entries = []
+        for name, size in sizes:
+            entries.append((name, (offset, size)))
+            offset += size
+        return SimpleIndex(entries)
+
+
+@pytest.mark.parametrize('opener', [fileio.ResourceFile, io])
+def test_subclass_parses_stream_with_io_api(
+    tmp_path: pathlib.Path,
+    opener: Opener,
+) -> None:
+    path = tmp_path / 'lines.arc'
+    path.write_bytes(b'a.txt 5\nb.txt 3\n\nhelloabc')
+    with _LinesArchive(path, opener=opener) as archive:
+        assert archive.index['a.txt'] == (len(b'a.txt 5\nb.txt 3\n\n'), 5)
+        with archive.open_bytes('a.txt') as member:
+            assert member.read() == b'hello'
+        with archive.open_bytes('b.txt') as member:
+            assert member.read() == b'abc'
+
+
+MEMBERS = {
+    'a.txt': b'hello',
+    'big.bin': bytes(range(256)) * 80,
+    'dir/c.txt': b'abc',
+}
+
+
+def _write_lines_archive(path: pathlib.Path) -> None:
+    header = ''.join(f'{name} {len(data)}\n' for name, data in MEMBERS.items())
+    path.write_bytes(header.encode() + b'\n' + b''.join(MEMBERS.values()))
+
+
+@pytest.mark.parametrize('opener', [fileio.ResourceFile, io])
+@pytest.mark.parametrize('pattern', ['*', '*.txt'])
+def test_extractall_copies_mapped_members(
+    tmp_path: pathlib.Path,
+    monkeypatch: pytest.MonkeyPatch,
+    opener: Opener,
+    pattern: str,
+) -> None:
+    path = tmp_path / 'lines.arc'
+    _write_lines_archive(path)
+    copied: list[int] = []
+
+    def copy_range(src_fd: int, dst: IO[bytes], offset: int, size: int) -> int:
+        copied.append(size)
+        return fileio.copy_range(src_fd, dst, offset, size)
+
+    monkeypatch.setattr(archive_module, 'copy_range', copy_range)
+    expected = {
+        pathlib.Path(name): data
+        for name, data in MEMBERS.items()
+        if pathlib.PurePath(name).match(pattern)
+    }
+    out = tmp_path / 'out'
+    with _LinesArchive(path, opener=opener) as archive:
+        archive.extractall(out, pattern)
+    extracted = {
+        file.relative_to(out): file.read_bytes()
+        for file in out.rglob('*')
+        if file.is_file()
+    }
+    assert extracted == expected
+    # every member is copied from the mapped file, whatever the opener
+    assert sorted(copied) == sorted(map(len, expected.values()))
+
+
+def test_archive_file_is_advised(
+    tmp_path: pathlib.Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    path = tmp_path / 'lines.arc'
+    _write_lines_archive(path)
+    advised: list[int] = []
+
+    def posix_fadvise(*args: int) -> None:
+        advised.append(args[-1])
+
+    monkeypatch.setattr(os, 'posix_fadvise', posix_fadvise, raising=False)
+    monkeypatch.setattr(os, 'POSIX_FADV_SEQUENTIAL', 2, raising=False)
+    monkeypatch.setattr(os, 'POSIX_FADV_RANDOM', 1, raising=False)
+    with _LinesArchive(path) as archive:
+        assert advised == [os.POSIX_FADV_SEQUENTIAL]
+        with archive.open_bytes('a.txt'):
+            pass
+        assert advised == [os.POSIX_FADV_SEQUENTIAL, os.POSIX_FADV_RANDOM]
+    advised.clear()
+    with (
+        _LinesArchive(io.BytesIO(path.read_bytes())) as archive,
+        archive.open_bytes('a.txt'),
+    ):
+        pass
+    assert not advised
+
+
+class _XORArchive(SimpleArchive):
+    """A single member stored XORed with 0x42, decoded by `_read_entry`."""
+
+    def _create_index(self) -> SimpleIndex:
+        return SimpleIndex([('a.txt', (0, 5))])
+
+    def _read_entry(self, entry: SimpleEntry) -> ReadView:
+        with super()._read_entry(entry) as stream:
+            data = bytes(byte ^ 0x42 for byte in stream.read())
+        return ReadView(io.BytesIO(data))
+
+
+@pytest.mark.parametrize('opener', [fileio.ResourceFile, io])
+def test_extractall_decodes_overridden_entries(
+    tmp_path: pathlib.Path,
+    opener: Opener,
+) -> None:
+    path = tmp_path / 'xor.arc'
+    path.write_bytes(bytes(byte ^ 0x42 for byte in b'hello'))
+    with _XORArchive(path, opener=opener) as archive:
+        with archive.open_bytes('a.txt') as member:
+            assert member.read() == b'hello'
+        archive.extractall(tmp_path / 'out')
+    assert (tmp_path / 'out' / 'a.txt').read_bytes() == b'hello'
+
+
+@pytest.mark.parametrize('storage', ['read', 'mapped'])
+@pytest.mark.parametrize('key', [0x00, 0x5A])
+def test_resource_file_data_is_decoded(
+    tmp_path: pathlib.Path,
+    monkeypatch: pytest.MonkeyPatch,
+    storage: str,
+    key: int,
+) -> None:
+    if storage == 'mapped':
+        # every file counts as large, mapped rather than read in and decoded
+        # into a temporary file
+        monkeypatch.setattr(fileio, '_SMALL_FILE_SIZE', 0)
+    plain = bytes(range(256)) * 64
+    path = tmp_path / 'res'
+    path.write_bytes(bytes(byte ^ key for byte in plain))
+    with fileio.ResourceFile.load(path, key=key) as res:
+        assert np.frombuffer(res.buffer, dtype='u1').tobytes() == plain
+        assert res.as_array().tobytes() == plain
+        assert not res.as_array().flags.writeable
+        assert bytes(res) == plain
+        assert bytes(res[100:200]) == plain[100:200]
+
+
+def test_resource_file_open_binary_is_io(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / 'lines'
+    path.write_bytes(b'one\ntwo\n')
+    with fileio.ResourceFile.open(path, 'rb') as stream:
+        assert isinstance(stream, io.IOBase)
+        assert stream.readline() == b'one\n'
+        assert list(stream) == [b'two\n']
+
+
+def test_resource_file_copy_above_memfd_limit(
+    tmp_path: pathlib.Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(fileio, '_SMALL_FILE_SIZE', 0)
+    monkeypatch.setattr(fileio, '_MEMFD_MAX_SIZE', 0)
+    plain = bytes(range(256)) * 64
+    path = tmp_path / 'res'
+    path.write_bytes(plain)
+    with fileio.ResourceFile.load(path) as res:
+        assert bytes(res) == plain
+
+
+@pytest.mark.parametrize('key', [0, 0x5A])
+def test_resource_readers_agree(tmp_path: pathlib.Path, key: int) -> None:
+    plain = bytes(range(256)) * 64
+    path = tmp_path / 'res'
+    path.write_bytes(bytes(byte ^ key for byte in plain))
+    with fileio.ResourceFile.open_pread(path, key=key) as reader:
+        assert isinstance(reader, fileio.RESOURCE_READERS)
+        assert reader.size == len(plain)
+        assert bytes(reader.read_at(1000, 300)) == plain[1000:1300]
+        assert reader.partial(100, 10000).read() == plain[100:10100]
+        reader.seek(-10, io.SEEK_END)
+        assert reader.read() == plain[-10:]
+        assert reader.read() == b''
+    assert reader.closed
+    with pytest.raises(OSError, match='closed'):
+        reader.read()
+
+
+def test_dropped_pread_reader_closes_its_file(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / 'res'
+    path.write_bytes(b'data')
+    # the file object behind the reader warns as it closes itself
+    with pytest.warns(ResourceWarning):
+        fileio.ResourceFile.open_pread(path)
+
+
+def test_read_file_advises_sequential_access(
+    tmp_path: pathlib.Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    advised: list[str] = []
+
+    def madvise(_data: np.memmap, advice: str) -> None:
+        advised.append(advice)
+
+    monkeypatch.setattr(fileio, '_SMALL_FILE_SIZE', 0)
+    monkeypatch.setattr(fileio, '_madvise', madvise)
+    path = tmp_path / 'res'
+    path.write_bytes(b'data')
+    assert fileio.read_file(str(path)) == b'data'
+    assert advised == ['MADV_SEQUENTIAL']
+
+
+def test_resource_file_has_no_instance_dict() -> None:
+    assert not hasattr(fileio.ResourceFile(b'abc'), '__dict__')
+
+
+def _build_xarc(members: dict[str, bytes]) -> bytes:
+    entries = b''.join(
+        name.encode('ascii') + b'\0' + struct.pack('<2I', len(data), 0)
+        for name, data in members.items()
+    )
+    base_offset = 12 + len(entries)
+    header = struct.pack('<3I', 1, len(members), base_offset)
+    return header + entries + b''.join(members.values())
+
+
+@pytest.mark.parametrize('opener', [fileio.ResourceFile, io])
+def test_xarc_round_trip(tmp_path: pathlib.Path, opener: Opener) -> None:
+    path = tmp_path / 'test.xarc'
+    path.write_bytes(_build_xarc(MEMBERS))
+    with xarc.TLJXArchive(path, opener=opener) as archive:
+        assert list(archive.index) == [os.path.normpath(name) for name in MEMBERS]
+        offset = path.stat().st_size - sum(map(len, MEMBERS.values()))
+        for name, data in MEMBERS.items():
+            assert archive.index[os.path.normpath(name)] == (offset, len(data))
+            offset += len(data)
+            with archive.open_bytes(name) as member:
+                assert member.read() == data
+    with xarc.TLJXArchive(io.BytesIO(path.read_bytes())) as from_stream:
+        assert dict(from_stream.index) == dict(archive.index)
+
+
+def _build_lpak(version: float, members: dict[str, bytes]) -> bytes:
+    names = b''.join(name.encode() + b'\0' for name in members)
+    index = struct.pack(f'<{len(members)}I', *range(len(members)))
+    entry_format = '<5I' if version == lpak.VERSION_1_0 else '<Q4I'
+    table = b''
+    data_offset = name_offset = 0
+    for name, data in members.items():
+        table += struct.pack(
+            entry_format,
+            data_offset,
+            name_offset,
+            len(data),
+            len(data),
+            0,
+        )
+        data_offset += len(data)
+        name_offset += len(name) + 1
+    data = b''.join(members.values())
+    if version == lpak.VERSION_1_0:
+        start, padding = lpak.HEADER.size, b''
+        sections = [index, table, names, data]
+        sizes = [len(section) for section in sections]
+    else:
+        start, padding = lpak.HEADER.size + 8, bytes(8)
+        sections = [table, index, names, data]
+        # sizes of the index and the file table come in the order of version 1.0
+        sizes = [len(index), len(table), len(names), len(data)]
+    offsets = []
+    for section in sections:
+        offsets.append(start)
+        start += len(section)
+    header = lpak.HEADER.pack(b'KAPL', version, *offsets, *sizes)
+    return header + padding + b''.join(sections)
+
+
+@pytest.mark.parametrize('opener', [fileio.ResourceFile, io])
+@pytest.mark.parametrize('version', [lpak.VERSION_1_0, lpak.VERSION_1_5])
+def test_lpak_round_trip(
+    tmp_path: pathlib.Path,
+    opener: Opener,
+    version: float,
+) -> None:
+    path = tmp_path / 'test.lpak'
+    path.write_bytes(_build_lpak(version, MEMBERS))
+    data_start = path.stat().st_size - sum(map(len, MEMBERS.values()))
+    archive = lpak.LPakArchive(path, opener=opener)
+    with archive:
+        assert archive.version == version
+        assert archive.data_off == data_start
+        assert list(archive.index) == [os.path.normpath(name) for name in MEMBERS]
+        offset = data_start
+        for name, data in MEMBERS.items():
+            entry = archive.index[name]
+            assert entry.data_offset == offset
+            assert entry.compressed_size == len(data)
+            offset += len(data)
+            with archive.open_bytes(name) as member:
+                assert member.read() == data
+
+
+# large enough for `open_buffer` to read it in place, through a `ResourceStream`
+DATA = bytes(range(256)) * 64
+
+
+def _open_data(kind: str) -> IO[bytes]:
+    if kind == 'bytes':
+        return io.BytesIO(DATA)
+    if kind == 'resource':
+        stream = fileio.open_buffer(memoryview(DATA))
+        assert isinstance(stream, io.BufferedReader)
+        return stream
+    return cast('IO[bytes]', fileio.open_reader(memoryview(DATA)))
+
+
+@pytest.mark.parametrize('kind', ['bytes', 'resource', 'reader'])
+def test_nested_partial_stream_views(kind: str) -> None:
+    stream = _open_data(kind)
+    stream.seek(100)
+    outer = cast('IO[bytes]', PartialStreamView(stream, 500))
+    outer.seek(400)
+    # reaches past the end of the outer view, which covers up to 600
+    inner = PartialStreamView(outer, 300)
+    assert inner.read() == DATA[500:600]
+    assert inner.read() == b''
+    inner.seek(50)
+    assert inner.read(1000) == DATA[550:600]
+    inner.seek(0)
+    buffer = bytearray(200)
+    assert inner.readinto(buffer) == len(DATA[500:600])
+    assert bytes(buffer[:100]) == DATA[500:600]
+    assert outer.read(50) == DATA[500:550]
+
+
+@pytest.mark.parametrize('kind', ['bytes', 'resource', 'reader'])
+def test_partial_stream_view_past_the_end(kind: str) -> None:
+    stream = _open_data(kind)
+    stream.seek(len(DATA) - 24)
+    view = PartialStreamView(stream, 100)
+    assert view.read() == DATA[-24:]
+    assert view.read(10) == b''